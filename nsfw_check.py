@@ -8,35 +8,52 @@ Threshold: 0.85 (same as roop's MAX_PROBABILITY)
 
 import sys
 import os
-from roop.predictor import predict_image, predict_video, MAX_PROBABILITY
+import socket
+from roop.predictor import predict_images, predict_video_frames, MAX_PROBABILITY
 import opennsfw2
 
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.gif'})
+
 def is_video_file(path: str) -> bool:
     """Check if file is a video based on extension."""
-    video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.gif'}
-    return os.path.splitext(path.lower())[1] in video_extensions
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
 
 def check_nsfw_image(image_path: str) -> None:
     """Check if an image is flagged as NSFW content."""
     try:
-        probability = predict_image(image_path)
-        is_nsfw = probability > MAX_PROBABILITY
-        
-        print(f"Image: {image_path}")
-        print(f"NSFW probability: {probability:.4f}")
-        print(f"Threshold: {MAX_PROBABILITY}")
-        print(f"Result: {'❌ BLOCKED (NSFW)' if is_nsfw else '✅ ALLOWED'}")
-        print()
-        
+        probability = opennsfw2.predict_image(image_path)
+        print_image_result(image_path, probability)
     except Exception as e:
         print(f"Error processing image '{image_path}': {e}")
 
+def check_nsfw_images(image_paths: list) -> None:
+    """Check a batch of images in a single model call."""
+    try:
+        probabilities = predict_images(image_paths)
+    except Exception as e:
+        # Batch preprocessing failed (e.g. one unreadable file) - fall back to per-file checks
+        print(f"Batch prediction failed ({e}), checking images one by one...")
+        for image_path in image_paths:
+            check_nsfw_image(image_path)
+        return
+    for image_path, probability in zip(image_paths, probabilities):
+        print_image_result(image_path, probability)
+
+def print_image_result(image_path: str, probability: float) -> None:
+    """Print the check result for a single image."""
+    is_nsfw = probability > MAX_PROBABILITY
+    print(f"Image: {image_path}")
+    print(f"NSFW probability: {probability:.4f}")
+    print(f"Threshold: {MAX_PROBABILITY}")
+    print(f"Result: {'❌ BLOCKED (NSFW)' if is_nsfw else '✅ ALLOWED'}")
+    print()
+
 def check_nsfw_video(video_path: str) -> None:
     """Check if a video is flagged as NSFW content."""
     try:
-        # Get detailed frame analysis like roop does
-        _, probabilities = opennsfw2.predict_video_frames(video_path=video_path, frame_interval=100)
-        
+        # Get detailed frame analysis like roop does (seeks to every 100th frame instead of decoding all)
+        probabilities = predict_video_frames(video_path, frame_interval=100)
+
         max_prob = max(probabilities) if probabilities else 0.0
         is_nsfw = any(prob > MAX_PROBABILITY for prob in probabilities)
         flagged_frames = sum(1 for prob in probabilities if prob > MAX_PROBABILITY)
@@ -52,16 +69,43 @@ def check_nsfw_video(video_path: str) -> None:
     except Exception as e:
         print(f"Error processing video '{video_path}': {e}")
 
-def check_nsfw(file_path: str) -> None:
-    """Check if a file (image or video) is flagged as NSFW content."""
-    if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' does not exist")
-        return
-    
-    if is_video_file(file_path):
-        check_nsfw_video(file_path)
-    else:
-        check_nsfw_image(file_path)
+def run_server(socket_path: str) -> None:
+    """Serve NSFW checks over a unix socket so the model is loaded once across many callers."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    print(f"NSFW check server listening on {socket_path}")
+    print("Send newline-separated file paths, receive '<path>\\t<probability>' lines back.")
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                with conn, conn.makefile('rw') as stream:
+                    for line in stream:
+                        file_path = line.strip()
+                        if not file_path:
+                            continue
+                        try:
+                            if is_video_file(file_path):
+                                probabilities = predict_video_frames(file_path, frame_interval=100)
+                                probability = max(probabilities) if probabilities else 0.0
+                            else:
+                                probability = predict_images([file_path])[0]
+                            stream.write(f"{file_path}\t{probability:.4f}\n")
+                        except Exception as e:
+                            stream.write(f"{file_path}\tERROR {e}\n")
+                        stream.flush()
+            except OSError as e:
+                # A client dropping mid-request must not take the warm server down
+                print(f"Client connection error: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
 
 def main():
     if len(sys.argv) < 2:
@@ -69,18 +113,37 @@ def main():
         print("       python nsfw_check.py /path/to/image.jpg")
         print("       python nsfw_check.py /path/to/video.mp4")
         print("       python nsfw_check.py *.jpg *.mp4")
+        print("       python nsfw_check.py --server /tmp/nsfw.sock")
         print()
         print("Supports images and videos. Videos are sampled every 100 frames.")
+        print("Server mode keeps the model loaded and answers path queries over a unix socket.")
         sys.exit(1)
+
+    if sys.argv[1] == '--server':
+        if len(sys.argv) != 3:
+            print("Usage: python nsfw_check.py --server <unix_socket_path>")
+            sys.exit(1)
+        run_server(sys.argv[2])
+        return
     
     file_paths = sys.argv[1:]
-    
+
     print(f"Checking {len(file_paths)} file(s) for NSFW content...")
     print(f"Using OpenNSFW2 model with threshold {MAX_PROBABILITY}")
     print("-" * 60)
-    
+
+    image_paths = []
     for file_path in file_paths:
-        check_nsfw(file_path)
+        if not os.path.exists(file_path):
+            print(f"Error: File '{file_path}' does not exist")
+        elif is_video_file(file_path):
+            check_nsfw_video(file_path)
+        else:
+            image_paths.append(file_path)
+
+    # Batch all images into one model call instead of one forward pass per file
+    if image_paths:
+        check_nsfw_images(image_paths)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
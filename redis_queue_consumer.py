@@ -9,20 +9,29 @@ Required environment variables:
 - UPSTASH_REDIS_REST_URL, UPSTASH_REDIS_REST_TOKEN: Redis connection
 - R2_ENDPOINT, R2_ACCESS_KEY, R2_SECRET_KEY, R2_BUCKET: Cloudflare R2 config
 - R2_PUBLIC_URL: Base URL for public R2 access (optional)
-- DOWNLOAD_DIR: Directory for temporary image downloads (default: ./downloads)
+- DOWNLOAD_DIR: Directory for temporary image downloads
+  (default: /dev/shm/roop-dl-<pid> when tmpfs exists, ./downloads otherwise)
 - OUTPUT_DIR: Directory for face swap outputs (default: ./output)
-- POLL_INTERVAL: Queue polling interval in seconds (default: 1.0)
+- WORKER_CONCURRENCY: Concurrent task slots (default: 2)
+- QUEUE_DRAIN_LIMIT: Max tasks drained per notification (default: 8)
+- ROOP_PERSISTENT_WORKER: Set to 0 for one run.py subprocess per task (default: 1)
+- REDIS_TCP_URL: Optional native RESP connection (needs the 'perf' extra)
+- R2_POOL_SIZE: Optional override for the R2 connection pool size
+- WORKER_ID, WORKER_CPUS: Replica identity and optional CPU pinning
 """
 
 import json
 import os
+import random
 import signal
+import socket
 import sys
 import time
 import subprocess
 import tempfile
 import shutil
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional, Any
 from urllib.parse import urlparse
@@ -30,20 +39,84 @@ from uuid import uuid4
 from queue import Queue
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from upstash_redis import Redis
 from loguru import logger
 from roop.utilities import is_gif
 
+# Prefer orjson for the hot JSON paths (task payloads, notifications, status bodies);
+# its JSONDecodeError subclasses the stdlib one so except clauses keep working
+try:
+    import orjson as fast_json
+except ImportError:
+    fast_json = json
+
+# Optional native RESP client - a single persistent TCP connection replaces one
+# HTTPS round-trip per Redis command when REDIS_TCP_URL is configured
+try:
+    import redis as redis_native
+except ImportError:
+    redis_native = None
+
 # Load environment variables
 load_dotenv()
 
+# Directory the consumer (and run.py / run_server.py) live in; computed once
+_ROOP_CWD = os.path.dirname(os.path.abspath(__file__))
+
+# Pops the highest-priority task and fetches+deletes its data in a single Redis round-trip
+POP_TASK_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1], 1)
+if #popped == 0 then
+    return nil
+end
+local task_data = redis.call('HGET', KEYS[2], popped[1])
+redis.call('HDEL', KEYS[2], popped[1])
+return {popped[1], popped[2], task_data, redis.call('ZCARD', KEYS[1])}
+"""
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that disables Nagle and enables TCP keepalive on pooled sockets.
+
+    Small SSE frames should not sit in Nagle's buffer waiting for an ACK, and
+    keepalive probes stop NATs from silently dropping the long-lived subscribe
+    connection (which otherwise shows up as a stalled stream and a reconnect).
+    """
+
+    SOCKET_OPTIONS = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    # Probe tuning is Linux-specific
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        SOCKET_OPTIONS += [
+            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10),
+        ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+# Replica identity - set when running several consumers against the same queue
+# so logs stay attributable and the fallback download dirs don't collide
+WORKER_ID = os.getenv('WORKER_ID', '')
+
 # Configure Loguru logging
 logger.remove()  # Remove default handler
+_log_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <level>{message}</level>"
+if WORKER_ID:
+    _log_format = _log_format.replace("| <level>{message}</level>", f"| <cyan>w{WORKER_ID}</cyan> | <level>{{message}}</level>")
 logger.add(
-    sys.stderr, 
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <level>{message}</level>",
+    sys.stderr,
+    format=_log_format,
     level="DEBUG",
     colorize=True
 )
@@ -61,7 +134,12 @@ class RedisQueueConsumer:
         self.queue_name = 'priority_queue'
         self.data_key = f'{self.queue_name}:data'
         self.notification_channel = 'task_notifications'
-        
+        # One subscriber connection serves every logical channel; new channels
+        # (cancellations, retries, ...) plug in here instead of opening more sockets
+        self._channel_handlers = {
+            self.notification_channel: self._handle_task_notification
+        }
+
         # API configuration for task status updates
         self.api_base_url = os.getenv('API_BASE_URL', 'https://aifacesswap.com')
         self.worker_api_key = os.getenv('WORKER_API_KEY')
@@ -70,10 +148,55 @@ class RedisQueueConsumer:
             logger.warning("WORKER_API_KEY not set. Task status updates will fail.")
         else:
             logger.info("API key configured for task status updates")
-        
-        # Image processing configuration
-        self.download_dir = os.getenv('DOWNLOAD_DIR', './downloads')
+
+        # Pooled HTTP session so status updates reuse keep-alive connections
+        # instead of paying a fresh TCP+TLS handshake per call
+        self.http = requests.Session()
+        adapter = KeepAliveAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3,
+                connect=2,
+                read=2,
+                backoff_factor=0.3,
+                status_forcelist=[429, 502, 503, 504],
+                allowed_methods=frozenset(['GET', 'PATCH'])
+            )
+        )
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
+        self._auth_headers = {
+            "Authorization": f"Bearer {self.worker_api_key}",
+            "Content-Type": "application/json"
+        }
+        # Warm urllib3's lazy TLS setup (CA bundle load, context build) here instead
+        # of inside the first task's PREPARING status call; the response is irrelevant
+        try:
+            self.http.get(f"{self.api_base_url}/healthz", timeout=(2, 2))
+        except requests.exceptions.RequestException:
+            pass
+
+        # Image processing configuration - downloads default to tmpfs when available
+        # so each task's short-lived inputs never hit the disk
+        self.download_dir = os.getenv('DOWNLOAD_DIR') or self._default_download_dir()
         self.output_dir = os.getenv('OUTPUT_DIR', './output')
+        # Disk fallback used when the tmpfs download dir runs low on space;
+        # namespaced per replica so parallel workers never collide on filenames
+        self._fallback_download_dir = os.path.join('./downloads', WORKER_ID) if WORKER_ID else './downloads'
+
+        # Optional CPU pinning for multi-replica deployments (WORKER_CPUS=0-3 or 0,2,4)
+        worker_cpus = os.getenv('WORKER_CPUS')
+        if worker_cpus and hasattr(os, 'sched_setaffinity'):
+            try:
+                cpu_set = set()
+                for part in worker_cpus.split(','):
+                    lo, _, hi = part.partition('-')
+                    cpu_set.update(range(int(lo), int(hi or lo) + 1))
+                os.sched_setaffinity(0, cpu_set)
+                logger.info("Pinned worker to CPUs: {}", sorted(cpu_set))
+            except (ValueError, OSError) as e:
+                logger.warning("Could not apply WORKER_CPUS '{}': {}", worker_cpus, e)
         
         # Cloudflare R2 configuration
         self.r2_endpoint = os.getenv('R2_ENDPOINT')
@@ -81,26 +204,114 @@ class RedisQueueConsumer:
         self.r2_secret_key = os.getenv('R2_SECRET_KEY')
         self.r2_bucket = os.getenv('R2_BUCKET')
         self.r2_public_url = os.getenv('R2_PUBLIC_URL')
-        
+        # Precomputed prefix so the common configured path never re-normalizes the URL
+        self._r2_public_prefix = self.r2_public_url.rstrip('/') + '/' if self.r2_public_url else None
+
         if not all([self.r2_endpoint, self.r2_access_key, self.r2_secret_key, self.r2_bucket]):
             raise ValueError("R2_ENDPOINT, R2_ACCESS_KEY, R2_SECRET_KEY, and R2_BUCKET must be set")
         
-        # Create directories if they don't exist
-        Path(self.download_dir).mkdir(parents=True, exist_ok=True)
-        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        # Create directories if they don't exist; keep the Path objects so the
+        # per-task joins below don't reconstruct them
+        self.download_dir_path = Path(self.download_dir)
+        self._fallback_download_dir_path = Path(self._fallback_download_dir)
+        self.output_dir_path = Path(self.output_dir)
+        self.download_dir_path.mkdir(parents=True, exist_ok=True)
+        self._fallback_download_dir_path.mkdir(parents=True, exist_ok=True)
+        self.output_dir_path.mkdir(parents=True, exist_ok=True)
         
         # Initialize Redis connection
         self.redis = Redis(url=self.redis_url, token=self.redis_token)
+
+        # Cache the pop script server-side so each pop sends a SHA instead of the body
+        try:
+            self._pop_script_sha = self.redis.script_load(POP_TASK_SCRIPT)
+        except Exception as e:
+            logger.warning("SCRIPT LOAD failed, falling back to EVAL per pop: {}", e)
+            self._pop_script_sha = None
+
+        # Optional native RESP connection for PUBSUB and pops (set REDIS_TCP_URL)
+        self.native_redis = None
+        self._native_pop_script = None
+        redis_tcp_url = os.getenv('REDIS_TCP_URL')
+        if redis_tcp_url:
+            if redis_native is None:
+                logger.warning("REDIS_TCP_URL set but the redis package is not installed; using REST")
+            else:
+                self.native_redis = redis_native.Redis.from_url(
+                    redis_tcp_url,
+                    socket_keepalive=True,
+                    health_check_interval=30,
+                    decode_responses=True
+                )
+                self._native_pop_script = self.native_redis.register_script(POP_TASK_SCRIPT)
+                logger.info("Using native Redis connection for queue operations")
+
+        # Thread pool for concurrent image downloads (boto3 clients are thread-safe)
+        self._dl_pool = ThreadPoolExecutor(max_workers=4)
+
+        # Background pool for intermediate status updates so they don't block the
+        # task pipeline on remote API round-trips
+        self._status_pool = ThreadPoolExecutor(max_workers=2)
+        # Ordering guard: a delayed PREPARING/PROCESSING retry must never land after
+        # the terminal DONE/FAILED update and overwrite it in the database
+        self._status_lock = threading.Lock()
+        self._pending_status: Dict[str, list] = {}
+        self._terminal_tasks: Dict[str, None] = {}
+
+        # Single-thread pool that absorbs post-task unlink latency
+        self._cleanup_pool = ThreadPoolExecutor(max_workers=1)
+
+        # Bounded task pool - WORKER_CONCURRENCY > 1 lets the downloads/uploads of
+        # one task overlap the face swap of another; set to 1 for serial behavior
+        self.concurrency = int(os.getenv('WORKER_CONCURRENCY', '2'))
+        self.task_pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._task_slots = threading.Semaphore(self.concurrency)
+        self._count_lock = threading.Lock()
+        self.processed_count = 0
+        # Max tasks a single notification is allowed to drain from the queue
+        self._drain_limit = int(os.getenv('QUEUE_DRAIN_LIMIT', '8'))
         
-        # Initialize R2 client
+        # Initialize R2 client - default boto3 timeouts/retries are tuned for flaky
+        # WAN links; R2 is a fast endpoint, so keep the tail latency bounded and the
+        # connection pool large enough for concurrent transfers
+        r2_config = BotoConfig(
+            signature_version='s3v4',
+            retries={'max_attempts': 3, 'mode': 'adaptive'},
+            connect_timeout=3,
+            read_timeout=20,
+            max_pool_connections=int(os.getenv('R2_POOL_SIZE', '0')) or max(32, 4 * self.concurrency),
+            tcp_keepalive=True
+        )
         self.r2_client = boto3.client(
             's3',
             endpoint_url=self.r2_endpoint,
             aws_access_key_id=self.r2_access_key,
             aws_secret_access_key=self.r2_secret_key,
-            region_name='auto'
+            region_name='auto',
+            config=r2_config
         )
-        
+        # Warm the client up front (endpoint resolution, credential signing, TLS
+        # handshake) so the first task doesn't pay it; failure here is not fatal
+        try:
+            self.r2_client.head_bucket(Bucket=self.r2_bucket)
+        except Exception as e:
+            logger.warning("R2 warm-up head_bucket failed: {}", e)
+
+        # Multipart/concurrency settings so large transfers use parallel ranges
+        # instead of a single TCP stream
+        self.transfer_config = TransferConfig(
+            multipart_threshold=4 * 1024 * 1024,
+            multipart_chunksize=4 * 1024 * 1024,
+            max_concurrency=8,
+            use_threads=True
+        )
+
+        # Persistent face-swap worker process (spawned lazily on first task).
+        # Set ROOP_PERSISTENT_WORKER=0 to fall back to one subprocess per task.
+        self.use_persistent_worker = os.getenv('ROOP_PERSISTENT_WORKER', '1') != '0'
+        self.roop_proc = None
+        self._roop_lock = threading.Lock()
+
         # Shutdown flag
         self.shutdown_requested = False
         
@@ -109,6 +320,13 @@ class RedisQueueConsumer:
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
         
+    @staticmethod
+    def _default_download_dir() -> str:
+        """Prefer tmpfs for temporary downloads so inputs stay in RAM."""
+        if os.path.isdir('/dev/shm'):
+            return f'/dev/shm/roop-dl-{os.getpid()}'
+        return './downloads'
+
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully"""
         if self.shutdown_requested:
@@ -129,12 +347,17 @@ class RedisQueueConsumer:
         try:
             # Remove leading slash if present
             r2_key = image_path[1:] if image_path.startswith('/') else image_path
-            
-            # Download from R2 using boto3
-            local_path = Path(self.download_dir) / filename
-            
-            with open(local_path, 'wb') as f:
-                self.r2_client.download_fileobj(self.r2_bucket, r2_key, f)
+
+            # Download from R2 using boto3; degrade to disk if tmpfs is nearly full
+            download_dir = self.download_dir_path
+            if self.download_dir.startswith('/dev/shm') and shutil.disk_usage(self.download_dir).free < 128 * 1024 * 1024:
+                logger.warning("tmpfs low on free space, downloading to disk instead")
+                download_dir = self._fallback_download_dir_path
+            local_path = download_dir / filename
+
+            # download_file lets s3transfer write ranged parts in parallel; a plain
+            # fileobj stream would force in-order writes
+            self.r2_client.download_file(self.r2_bucket, r2_key, str(local_path), Config=self.transfer_config)
                 
             logger.debug("Downloaded from R2: {} -> {}", r2_key, local_path)
             return str(local_path)
@@ -144,11 +367,78 @@ class RedisQueueConsumer:
             
     def run_face_swap(self, source_path: str, target_path: str, output_path: str) -> None:
         """
-        Execute face swap command using subprocess.
+        Execute a face swap, preferring the persistent worker process so model and
+        framework startup is paid once instead of per task.
+        """
+        if self.use_persistent_worker:
+            self._run_face_swap_persistent(source_path, target_path, output_path)
+        else:
+            self._run_face_swap_subprocess(source_path, target_path, output_path)
+        logger.success("Face swap completed successfully: {}", output_path)
+
+    def _spawn_roop_worker(self) -> None:
+        """Start the persistent face-swap worker and wait for its ready handshake."""
+        logger.info("Starting persistent face swap worker...")
+        self.roop_proc = subprocess.Popen(
+            ['python', 'run_server.py'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            cwd=_ROOP_CWD
+        )
+        ready_line = self.roop_proc.stdout.readline()
+        try:
+            ready = json.loads(ready_line) if ready_line else {}
+        except json.JSONDecodeError:
+            ready = {}
+        if not ready.get('ready'):
+            self._kill_roop_worker()
+            raise Exception("Face swap worker failed to start")
+        logger.success("Face swap worker ready")
+
+    def _kill_roop_worker(self) -> None:
+        if self.roop_proc:
+            try:
+                self.roop_proc.kill()
+            except OSError:
+                pass
+            self.roop_proc = None
+
+    def _run_face_swap_persistent(self, source_path: str, target_path: str, output_path: str) -> None:
+        """Send one task to the persistent worker over its stdin/stdout line protocol."""
+        task = {
+            'source': source_path,
+            'target': target_path,
+            'output': output_path,
+            'keep_fps': is_gif(target_path)
+        }
+        if task['keep_fps']:
+            logger.info("Target is GIF, keeping original frame rate")
+        # The swap pipeline handles one task at a time; serialize access to the worker
+        with self._roop_lock:
+            if self.roop_proc is None or self.roop_proc.poll() is not None:
+                self._spawn_roop_worker()
+            try:
+                self.roop_proc.stdin.write(json.dumps(task) + '\n')
+                self.roop_proc.stdin.flush()
+                result_line = self.roop_proc.stdout.readline()
+            except (BrokenPipeError, OSError) as e:
+                self._kill_roop_worker()
+                raise Exception(f"Face swap worker died: {e}")
+            if not result_line:
+                self._kill_roop_worker()
+                raise Exception("Face swap worker exited unexpectedly")
+        result = json.loads(result_line)
+        if not result.get('ok'):
+            raise Exception(f"Face swap failed: {result.get('error', 'unknown error')}")
+
+    def _run_face_swap_subprocess(self, source_path: str, target_path: str, output_path: str) -> None:
+        """
+        Execute face swap command using a one-shot subprocess.
         """
         try:
             cmd = [
-                'python', 'run.py',
+                'python', os.path.join(_ROOP_CWD, 'run.py'),
                 '-s', source_path,
                 '-t', target_path, 
                 '-o', output_path,
@@ -161,21 +451,40 @@ class RedisQueueConsumer:
                 logger.info("Target is GIF, adding --keep-fps flag")
             
             logger.info("Executing face swap: {}", ' '.join(cmd))
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(os.path.abspath(__file__))  # Run from roop directory
-            )
-            
+
+            # Stream subprocess output to a per-task log file instead of buffering
+            # roop's verbose tqdm output in memory via capture_output
+            log_path = self.output_dir_path / (Path(output_path).stem + '.log')
+            # Skip .pyc writes (roop's modules recompile per run anyway) and keep the
+            # log unbuffered so a crashed run still leaves its last lines behind
+            env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1', 'PYTHONUNBUFFERED': '1'}
+            with open(log_path, 'wb') as log_file:
+                # close_fds=False and no cwd keep subprocess on the posix_spawn fast
+                # path, skipping the page-table copy of this process's heap
+                result = subprocess.run(
+                    cmd,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                    close_fds=False,
+                    env=env
+                )
+
             if result.returncode != 0:
-                raise Exception(f"Face swap failed with exit code {result.returncode}. stderr: {result.stderr}")
-                
-            logger.success("Face swap completed successfully: {}", output_path)
-            
+                raise Exception(f"Face swap failed with exit code {result.returncode}. log tail: {self._tail_file(log_path)}")
+
         except Exception as e:
             raise Exception(f"Failed to execute face swap: {e}")
+
+    @staticmethod
+    def _tail_file(log_path, size: int = 4096) -> str:
+        """Return the last `size` bytes of a log file for error reporting."""
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(f.tell() - size, 0))
+                return f.read().decode(errors='replace')
+        except OSError:
+            return '<log unavailable>'
             
     def _get_file_extension_and_mime_type(self, file_path: str) -> tuple[str, str]:
         """
@@ -221,9 +530,9 @@ class RedisQueueConsumer:
         # Ultimate fallback
         return ('.jpg', 'image/jpeg')
 
-    def upload_to_r2(self, local_path: str, task_id: str, user_id: str = None) -> str:
+    def upload_to_r2(self, local_path: str, task_id: str, user_id: str = None) -> tuple[str, str]:
         """
-        Upload file to Cloudflare R2 and return public URL.
+        Upload file to Cloudflare R2 and return (public URL, R2 key).
         """
         try:
             # Detect actual file extension and MIME type
@@ -238,18 +547,31 @@ class RedisQueueConsumer:
             
             logger.info("Uploading {} to R2 as {} with content type {}", local_path, r2_key, content_type)
             
-            # Upload to R2
+            # Upload to R2 - small files go through a single PUT to skip the
+            # s3transfer manager's thread/queue setup
+            size = os.path.getsize(local_path)
             with open(local_path, 'rb') as f:
-                self.r2_client.upload_fileobj(
-                    f, 
-                    self.r2_bucket, 
-                    r2_key,
-                    ExtraArgs={'ContentType': content_type}
-                )
+                if size < self.transfer_config.multipart_threshold:
+                    self.r2_client.put_object(
+                        Bucket=self.r2_bucket,
+                        Key=r2_key,
+                        Body=f,
+                        ContentType=content_type,
+                        ContentLength=size
+                    )
+                else:
+                    self.r2_client.upload_fileobj(
+                        f,
+                        self.r2_bucket,
+                        r2_key,
+                        ExtraArgs={'ContentType': content_type},
+                        Config=self.transfer_config
+                    )
             
-            # Generate public URL
-            if self.r2_public_url:
-                public_url = f"{self.r2_public_url.rstrip('/')}/{r2_key}"
+            # Generate public URL - only build a presigned URL (HMAC + Signer object)
+            # when no public base URL is configured
+            if self._r2_public_prefix:
+                public_url = self._r2_public_prefix + r2_key
             else:
                 # Fallback to pre-signed URL if no public URL configured
                 public_url = self.r2_client.generate_presigned_url(
@@ -259,8 +581,8 @@ class RedisQueueConsumer:
                 )
             
             logger.success("Uploaded to R2: {} -> {}", r2_key, public_url)
-            return public_url
-            
+            return public_url, r2_key
+
         except Exception as e:
             raise Exception(f"Failed to upload to R2: {e}")
     
@@ -268,17 +590,19 @@ class RedisQueueConsumer:
         """
         Update task status in D1 database via API endpoint.
         """
+        if status in ('DONE', 'FAILED'):
+            self._mark_terminal(task_id)
+        elif self._is_terminal(task_id):
+            logger.debug("Skipping stale {} update for finished task {}", status, task_id)
+            return False
+
         if not self.worker_api_key:
             logger.warning("No API key configured, skipping status update")
             return False
             
         try:
             url = f"{self.api_base_url}/api/tasks/{task_id}/status"
-            headers = {
-                "Authorization": f"Bearer {self.worker_api_key}",
-                "Content-Type": "application/json"
-            }
-            
+
             data = {"status": status}
             if result_image_path:
                 data["resultImagePath"] = result_image_path
@@ -287,7 +611,9 @@ class RedisQueueConsumer:
             logger.debug("API URL: {}", url)
             logger.debug("Request data: {}", data)
             
-            response = requests.patch(url, json=data, headers=headers, timeout=10)
+            # Serialize the body ourselves so requests doesn't go through the stdlib encoder
+            # Split (connect, read) timeouts bound the stall from DNS/remote slowness
+            response = self.http.patch(url, data=fast_json.dumps(data), headers=self._auth_headers, timeout=(2, 8))
             
             if response.status_code == 200:
                 logger.success("Task {} status updated to {}", task_id, status)
@@ -301,14 +627,54 @@ class RedisQueueConsumer:
         except Exception as e:
             logger.exception("Error updating task status: {}", e)
             return False
-        
+
+    def update_task_status_async(self, task_id: str, status: str, result_image_path: str = None) -> None:
+        """
+        Fire-and-forget status update for non-terminal states (PREPARING/PROCESSING).
+        Terminal DONE/FAILED updates stay on the synchronous path, which cancels or
+        waits out these pending updates before sending (see _mark_terminal).
+        """
+        with self._status_lock:
+            if task_id in self._terminal_tasks:
+                return
+            future = self._status_pool.submit(self.update_task_status, task_id, status, result_image_path)
+            self._pending_status.setdefault(task_id, []).append(future)
+
+    def _is_terminal(self, task_id: str) -> bool:
+        with self._status_lock:
+            return task_id in self._terminal_tasks
+
+    def _mark_terminal(self, task_id: str) -> None:
+        """
+        Record that a task reached DONE/FAILED and flush its pending async updates:
+        queued ones are cancelled, in-flight ones (which can sit in retries for tens
+        of seconds) are waited for, so the terminal PATCH always reaches the API last.
+        """
+        with self._status_lock:
+            self._terminal_tasks[task_id] = None
+            # Bound the guard's memory; oldest tasks can no longer race anyway
+            while len(self._terminal_tasks) > 1024:
+                self._terminal_tasks.pop(next(iter(self._terminal_tasks)))
+            pending = self._pending_status.pop(task_id, [])
+        for future in pending:
+            if not future.cancel():
+                try:
+                    future.result(timeout=60)
+                except Exception:
+                    pass
+
     def run_pubsub_consumer(self):
         """
         Main PUBSUB consumer - subscribes to notifications and processes tasks.
         This is the ONLY way the consumer works - no polling, no fallbacks.
         """
+        if self.native_redis:
+            self._consume_native_pubsub()
+            self._shutdown_workers()
+            return
+
         logger.info("Starting PUBSUB consumer for channel: {}", self.notification_channel)
-        
+
         # Extract base URL from Redis REST URL
         base_url = self.redis_url.rstrip('/')
         subscribe_url = f"{base_url}/subscribe/{self.notification_channel}"
@@ -319,57 +685,44 @@ class RedisQueueConsumer:
         }
         
         logger.info("Connecting to SSE endpoint: {}", subscribe_url)
-        
-        processed_count = 0
-        
+
+        reconnect_attempts = 0
         while not self.shutdown_requested:
             try:
                 # Connect to Server-Sent Events endpoint
-                response = requests.get(subscribe_url, headers=headers, stream=True, timeout=None)
+                response = self.http.get(subscribe_url, headers=headers, stream=True, timeout=None)
                 response.raise_for_status()
-                
+
                 logger.success("PUBSUB connection established!")
                 logger.info("Waiting for task notifications...")
                 
                 try:
-                    for line in response.iter_lines(decode_unicode=True):
+                    # Parse the stream as raw bytes; decode_unicode=True would str-decode
+                    # every chunk and each split below would allocate short-lived strings.
+                    # json.loads/orjson.loads both accept bytes directly.
+                    data_prefix = b'data: '
+                    handlers = {channel.encode(): handler for channel, handler in self._channel_handlers.items()}
+                    for line in response.iter_lines(decode_unicode=False):
                         if self.shutdown_requested:
                             logger.warning("Shutdown requested, closing SSE connection...")
                             break
-                            
-                        if line and line.startswith('data: '):
+
+                        if line and line.startswith(data_prefix):
                             try:
                                 # Parse SSE data format: "data: message,channel,content"
                                 data = line[6:]  # Remove "data: " prefix
-                                parts = data.split(',', 2)  # Split into max 3 parts
-                                
-                                if len(parts) >= 3 and parts[0] == 'message':
-                                    channel = parts[1]
-                                    message_content = parts[2]
-                                    
-                                    if channel == self.notification_channel:
-                                        # Got a task notification - process it immediately
-                                        try:
-                                            notification = json.loads(message_content)
-                                            task_id = notification.get('taskId', 'unknown')
-                                            logger.info("Received notification for task: {}", task_id)
-                                            
-                                            # Pop the task from Redis queue
-                                            task = self._pop_and_process_task()
-                                            
-                                            if task:
-                                                processed_count += 1
-                                                logger.success("Task {} processed (total: {})", task['task_id'], processed_count)
-                                            else:
-                                                logger.warning("No task found in queue for notification {}", task_id)
-                                                
-                                        except json.JSONDecodeError:
-                                            logger.warning("Invalid JSON in notification: {}", message_content)
-                                        except Exception as e:
-                                            logger.warning("Error processing notification: {}", e)
-                                            
-                                elif parts[0] == 'subscribe':
-                                    logger.info("Subscribed to channel: {}", parts[1])
+                                parts = data.split(b',', 2)  # Split into max 3 parts
+
+                                if len(parts) >= 3 and parts[0] == b'message':
+                                    handler = handlers.get(parts[1])
+                                    if handler:
+                                        handler(parts[2])
+
+                                elif parts[0] == b'subscribe':
+                                    # Only a confirmed subscription counts as healthy;
+                                    # a connect that dies earlier keeps backing off
+                                    reconnect_attempts = 0
+                                    logger.info("Subscribed to channel: {}", parts[1].decode())
                                     
                             except Exception as e:
                                 logger.warning("Error parsing SSE message: {}", e)
@@ -387,52 +740,170 @@ class RedisQueueConsumer:
                             
             except requests.exceptions.RequestException as e:
                 logger.warning("PUBSUB connection lost: {}", e)
-                if not self.shutdown_requested:
-                    logger.info("Reconnecting immediately...")
+                reconnect_attempts = self._sleep_before_reconnect(reconnect_attempts)
             except Exception as e:
                 logger.warning("PUBSUB error: {}", e)
-                if not self.shutdown_requested:
-                    logger.info("Reconnecting immediately...")
-        
-        logger.info("Worker stopped. Total tasks processed: {}", processed_count)
-    
+                reconnect_attempts = self._sleep_before_reconnect(reconnect_attempts)
+
+        self._shutdown_workers()
+
+    def _sleep_before_reconnect(self, reconnect_attempts: int) -> int:
+        """
+        Back off exponentially (with jitter, capped at 16s) before reconnecting so a
+        flapping endpoint is not hammered in a tight loop. Returns the new attempt count.
+        """
+        if not self.shutdown_requested:
+            # clamp the exponent itself - an unbounded 2**attempts overflows float
+            # conversion after a long enough outage
+            delay = min(16.0, 0.25 * (2 ** min(reconnect_attempts, 7))) + random.uniform(0, 0.25)
+            logger.info("Reconnecting in {:.2f}s...", delay)
+            time.sleep(delay)
+        return reconnect_attempts + 1
+
+    def _consume_native_pubsub(self) -> None:
+        """
+        PUBSUB consumer over a persistent RESP connection - no HTTPS/SSE framing,
+        one socket for the lifetime of the worker.
+        """
+        logger.info("Starting native PUBSUB consumer for channel: {}", self.notification_channel)
+
+        reconnect_attempts = 0
+        while not self.shutdown_requested:
+            pubsub = None
+            try:
+                pubsub = self.native_redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(*self._channel_handlers)
+                reconnect_attempts = 0
+                logger.success("Native PUBSUB connection established!")
+                logger.info("Waiting for task notifications...")
+
+                for message in pubsub.listen():
+                    if self.shutdown_requested:
+                        logger.warning("Shutdown requested, closing PUBSUB connection...")
+                        break
+                    if message.get('type') != 'message':
+                        continue
+                    handler = self._channel_handlers.get(message.get('channel'))
+                    if handler:
+                        handler(message['data'])
+
+            except KeyboardInterrupt:
+                logger.warning("KeyboardInterrupt received during PUBSUB")
+                self.shutdown_requested = True
+            except Exception as e:
+                logger.warning("Native PUBSUB connection lost: {}", e)
+                reconnect_attempts = self._sleep_before_reconnect(reconnect_attempts)
+            finally:
+                if pubsub:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _shutdown_workers(self) -> None:
+        """Drain the worker pools and stop the swap worker process."""
+        self.task_pool.shutdown(wait=True)
+        self._status_pool.shutdown(wait=True)
+        self._cleanup_pool.shutdown(wait=True)
+        self._kill_roop_worker()
+        logger.info("Worker stopped. Total tasks processed: {}", self.processed_count)
+
+    def _handle_task_notification(self, message_content) -> None:
+        """Handle one message on the task notification channel (str or bytes JSON)."""
+        try:
+            notification = fast_json.loads(message_content)
+            task_id = notification.get('taskId', 'unknown')
+            logger.info("Received notification for task: {}", task_id)
+
+            # Dispatch to the task pool; blocks for a free slot so
+            # subscriber reads backpressure naturally
+            self._dispatch_task(task_id)
+
+        except json.JSONDecodeError:
+            logger.warning("Invalid JSON in notification: {}", message_content)
+        except Exception as e:
+            logger.warning("Error processing notification: {}", e)
+
+    def _dispatch_task(self, notification_task_id: str) -> None:
+        """Run one pop+process cycle on the task pool, bounded by the semaphore."""
+        self._task_slots.acquire()
+        try:
+            self.task_pool.submit(self._run_one, notification_task_id)
+        except Exception:
+            self._task_slots.release()
+            raise
+
+    def _run_one(self, notification_task_id: str) -> None:
+        try:
+            # Keep draining while the pop reports a backlog: bursty publishes can
+            # coalesce notifications, so one event may stand for several queued tasks
+            for drained in range(self._drain_limit):
+                task = self._pop_and_process_task()
+                if not task:
+                    if drained == 0:
+                        logger.warning("No task found in queue for notification {}", notification_task_id)
+                    break
+                with self._count_lock:
+                    self.processed_count += 1
+                    count = self.processed_count
+                logger.success("Task {} processed (total: {})", task['task_id'], count)
+                if self.shutdown_requested or not task.get('queue_remaining'):
+                    break
+        finally:
+            self._task_slots.release()
+
     def _pop_and_process_task(self) -> Optional[Dict[str, Any]]:
         """
         Pop task from queue and process it immediately.
         Returns task data if successful, None otherwise.
         """
         try:
-            # Pop highest priority task from queue
-            result = self.redis.zpopmin(self.queue_name, count=1)
-            
+            # Pop highest priority task and fetch+delete its data atomically (one round-trip)
+            if self._native_pop_script:
+                result = self._native_pop_script(keys=[self.queue_name, self.data_key])
+            elif self._pop_script_sha:
+                try:
+                    result = self.redis.evalsha(self._pop_script_sha, keys=[self.queue_name, self.data_key], args=[])
+                except Exception as e:
+                    if 'NOSCRIPT' not in str(e).upper():
+                        raise
+                    # Script cache was flushed (server restart/failover): run the
+                    # source once and re-register the SHA for subsequent pops
+                    logger.warning("Pop script missing from Redis script cache, re-registering")
+                    result = self.redis.eval(POP_TASK_SCRIPT, keys=[self.queue_name, self.data_key], args=[])
+                    try:
+                        self._pop_script_sha = self.redis.script_load(POP_TASK_SCRIPT)
+                    except Exception as load_error:
+                        logger.warning("SCRIPT LOAD failed, falling back to EVAL per pop: {}", load_error)
+                        self._pop_script_sha = None
+            else:
+                result = self.redis.eval(POP_TASK_SCRIPT, keys=[self.queue_name, self.data_key], args=[])
+
             if not result:
                 return None
-                
-            # Extract task ID and priority
-            task_id = result[0][0]  # First item's member
-            priority = result[0][1]  # First item's score
-            
-            # Get task data from hash
-            task_data_json = self.redis.hget(self.data_key, task_id)
-            
+
+            # Script returns [task_id, priority, task_data_json, remaining_queue_size]
+            task_id = result[0]
+            priority = float(result[1])
+            task_data_json = result[2]
+            queue_size = int(result[3])
+
             if not task_data_json:
                 logger.warning("Task data not found for task ID: {}", task_id)
                 return None
-                
+
             # Parse task data
-            task_data = json.loads(task_data_json)
-            
-            # Remove task data from hash (cleanup)
-            self.redis.hdel(self.data_key, task_id)
-            
+            task_data = fast_json.loads(task_data_json)
+
             # Build task object
             task = {
                 'task_id': task_id,
                 'priority': priority,
-                'data': task_data
+                'data': task_data,
+                'queue_remaining': queue_size
             }
             
-            logger.info("Popped task: {} (priority: {})", task_id, priority)
+            logger.info("Popped task: {} (priority: {}, {} left in queue)", task_id, priority, queue_size)
             
             # Process the task (check for shutdown during processing)
             if self.shutdown_requested:
@@ -461,7 +932,7 @@ class RedisQueueConsumer:
         data = task['data']
         
         # Generate unique filenames with original extensions
-        unique_id = str(uuid4())[:8]
+        unique_id = uuid4().hex[:8]
         
         # Extract extensions from original file paths
         swap_image_path = data.get('swapImage', '')
@@ -477,7 +948,7 @@ class RedisQueueConsumer:
         # File paths
         swap_path = None
         target_path = None
-        output_path = str(Path(self.output_dir) / output_filename)
+        output_path = str(self.output_dir_path / output_filename)
         
         try:
             logger.info("Processing task: {} (action: {}, priority: {})", task_id, data.get('action', 'unknown'), int(task['priority']))
@@ -487,40 +958,49 @@ class RedisQueueConsumer:
                 logger.warning("Shutdown requested, skipping task processing")
                 return None
                 
-            # Update status to PREPARING
-            self.update_task_status(task_id, "PREPARING")
+            # Update status to PREPARING in the background - the downloads that follow
+            # would otherwise wait on the API round-trip
+            self.update_task_status_async(task_id, "PREPARING")
             
-            # Download swap image (source)
+            # Validate both image paths before downloading
             swap_image_path = data.get('swapImage')
+            target_image_path = data.get('targetImage')
             logger.info("Swap image path: {}", swap_image_path)
+            logger.info("Target image path: {}", target_image_path)
             if not swap_image_path:
                 raise Exception("swapImage path not provided in task data")
-            logger.info("Downloading swap image: {} -> {}", swap_image_path, swap_filename)
-            swap_path = self.download_image(swap_image_path, swap_filename)
-            logger.success("Swap image downloaded: {}", swap_path)
-            
-            # Check for shutdown after download
-            if self.shutdown_requested:
-                logger.warning("Shutdown requested during download")
-                return None
-            
-            # Download target image
-            target_image_path = data.get('targetImage')
-            logger.info("Target image path: {}", target_image_path)
             if not target_image_path:
                 raise Exception("targetImage path not provided in task data")
+
+            # Download both images concurrently - two independent R2 GETs
+            logger.info("Downloading swap image: {} -> {}", swap_image_path, swap_filename)
             logger.info("Downloading target image: {} -> {}", target_image_path, target_filename)
-            target_path = self.download_image(target_image_path, target_filename)
+            swap_future = self._dl_pool.submit(self.download_image, swap_image_path, swap_filename)
+            target_future = self._dl_pool.submit(self.download_image, target_image_path, target_filename)
+            # Resolve both futures even when one fails, so every file that did get
+            # written is recorded and the finally-cleanup can unlink it
+            download_error = None
+            try:
+                swap_path = swap_future.result()
+            except Exception as e:
+                download_error = e
+            try:
+                target_path = target_future.result()
+            except Exception as e:
+                download_error = download_error or e
+            if download_error:
+                raise download_error
+            logger.success("Swap image downloaded: {}", swap_path)
             logger.success("Target image downloaded: {}", target_path)
-            
-            # Check for shutdown before face swap
+
+            # Check for shutdown after downloads
             if self.shutdown_requested:
                 logger.warning("Shutdown requested before face swap")
                 return None
             
             # Update status to PROCESSING
             logger.info("Updating task status to PROCESSING")
-            self.update_task_status(task_id, "PROCESSING")
+            self.update_task_status_async(task_id, "PROCESSING")
             
             # Run face swap
             logger.info("Running face swap: {} -> {}", swap_path, target_path)
@@ -536,20 +1016,10 @@ class RedisQueueConsumer:
             # Upload result to R2
             logger.info("Uploading result to R2...")
             user_id = data.get('userId')
-            public_url = self.upload_to_r2(output_path, task_id, user_id)
-            
-            # Extract result R2 path for database
-            # Convert public URL back to R2 path
-            if self.r2_public_url and public_url.startswith(self.r2_public_url):
-                result_r2_path = public_url.replace(self.r2_public_url.rstrip('/'), '').lstrip('/')
-            else:
-                # Fallback - extract from upload path pattern with detected extension
-                file_ext, _ = self._get_file_extension_and_mime_type(output_path)
-                if user_id:
-                    result_r2_path = f"uploads/{user_id}/outputs/{task_id}{file_ext}"
-                else:
-                    result_r2_path = f"uploads/anonymous/outputs/{task_id}{file_ext}"
-            
+            # upload_to_r2 returns the exact key it wrote, so there is no need to
+            # reconstruct the result path from the public URL
+            public_url, result_r2_path = self.upload_to_r2(output_path, task_id, user_id)
+
             # Update status to DONE with result path
             logger.info("Updating database with result path: {}", result_r2_path)
             status_updated = self.update_task_status(task_id, "DONE", result_r2_path)
@@ -570,19 +1040,26 @@ class RedisQueueConsumer:
             return None
             
         finally:
-            # Clean up downloaded files
-            for file_path in [swap_path, target_path]:
-                if file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        logger.debug("Cleaned up: {}", file_path)
-                    except Exception as e:
-                        logger.warning("Failed to clean up {}: {}", file_path, e)
-            
+            # Clean up downloaded files off the hot path; the unlink syscalls run on
+            # the cleanup thread so the slot frees up for the next task immediately
+            for file_path in (swap_path, target_path):
+                if file_path:
+                    self._cleanup_pool.submit(self._safe_unlink, file_path)
+
             # Clean up output file (optional - keep for debugging)
             # if os.path.exists(output_path):
             #     os.remove(output_path)
-            
+
+    @staticmethod
+    def _safe_unlink(file_path: str) -> None:
+        """Unlink without a prior exists() stat; missing files are fine."""
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Failed to clean up {}: {}", file_path, e)
+
     def log_task_details(self, task: Dict[str, Any]):
         """Log task details in a structured format"""
         task_id = task['task_id']
@@ -590,6 +1067,12 @@ class RedisQueueConsumer:
         data = task['data']
         
         logger.info("Processing task: {}", task_id)
+
+        # Skip the per-field lookups and the metadata loop entirely when no sink
+        # records DEBUG; loguru would otherwise evaluate every argument first
+        if logger._core.min_level > 10:
+            return
+
         logger.debug("  Action: {}", data.get('action', 'unknown'))
         logger.debug("  Priority: {}", int(priority))
         logger.debug("  Target Image: {}", data.get('targetImage', 'N/A'))
@@ -1,4 +1,7 @@
 import threading
+from typing import List
+
+import cv2
 import numpy
 import opennsfw2
 from PIL import Image
@@ -38,6 +41,51 @@ def predict_image(target_path: str) -> bool:
     return opennsfw2.predict_image(target_path) > MAX_PROBABILITY
 
 
+def predict_images(target_paths: List[str]) -> List[float]:
+    images = [opennsfw2.preprocess_image(Image.open(target_path), opennsfw2.Preprocessing.YAHOO) for target_path in target_paths]
+    views = numpy.stack(images)
+    predictions = get_predictor().predict(views, batch_size=32)
+    return [float(probability) for _, probability in predictions]
+
+
+def prepare_frame(frame: Frame) -> numpy.ndarray:
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return opennsfw2.preprocess_image(image, opennsfw2.Preprocessing.YAHOO)
+
+
+def predict_video_frames(target_path: str, frame_interval: int = 100) -> List[float]:
+    # seek to the sampled frames instead of decoding every frame like opennsfw2.predict_video_frames does
+    capture = cv2.VideoCapture(target_path)
+    frame_total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    images = []
+    if frame_total > 0:
+        for frame_number in range(0, frame_total, frame_interval):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            has_frame, frame = capture.read()
+            if not has_frame:
+                break
+            images.append(prepare_frame(frame))
+    else:
+        # index-less containers (some WebM/GIF/streams) report 0/-1 frames and can't
+        # seek reliably - decode sequentially and sample every frame_interval frames
+        frame_number = 0
+        while True:
+            has_frame, frame = capture.read()
+            if not has_frame:
+                break
+            if frame_number % frame_interval == 0:
+                images.append(prepare_frame(frame))
+            frame_number += 1
+    capture.release()
+    if not images:
+        return []
+    predictions = get_predictor().predict(numpy.stack(images), batch_size=32)
+    return [float(probability) for _, probability in predictions]
+
+
 def predict_video(target_path: str) -> bool:
-    _, probabilities = opennsfw2.predict_video_frames(video_path=target_path, frame_interval=100)
+    probabilities = predict_video_frames(target_path)
+    if not probabilities:
+        # no decodable frame means no coverage - fail closed instead of passing the filter
+        return True
     return any(probability > MAX_PROBABILITY for probability in probabilities)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Persistent Face Swap Worker
+
+Long-lived companion process for the Redis queue consumer. Reads one JSON task per
+line from stdin ({"source": ..., "target": ..., "output": ..., "keep_fps": bool})
+and writes one JSON result line ({"ok": true} or {"ok": false, "error": "..."}) per
+task. Keeping the process alive amortizes Python/TensorFlow/ONNX startup across all
+tasks instead of paying it on every swap.
+"""
+
+import json
+import sys
+
+# roop prints status lines to stdout; reserve the real stdout for the line protocol
+# and send everything else to stderr
+_protocol_out = sys.stdout
+sys.stdout = sys.stderr
+
+import cv2
+
+import roop.globals
+from roop import core
+
+# Re-encode quality for JPEG outputs; cv2 links libjpeg-turbo on most distros
+JPEG_QUALITY = 85
+
+
+def configure_defaults() -> None:
+    # Mirror the CLI defaults from roop.core.parse_args for a headless run
+    roop.globals.headless = True
+    roop.globals.frame_processors = ['face_swapper']
+    roop.globals.keep_fps = False
+    roop.globals.keep_frames = False
+    roop.globals.skip_audio = False
+    roop.globals.many_faces = False
+    roop.globals.reference_face_position = 0
+    roop.globals.reference_frame_number = 0
+    roop.globals.similar_face_distance = 0.85
+    roop.globals.temp_frame_format = 'png'
+    roop.globals.temp_frame_quality = 0
+    roop.globals.output_video_encoder = 'libx264'
+    roop.globals.output_video_quality = 35
+    roop.globals.max_memory = None
+    roop.globals.execution_providers = core.decode_execution_providers(['cpu'])
+    roop.globals.execution_threads = core.suggest_execution_threads()
+
+
+def process_task(task: dict) -> None:
+    roop.globals.source_path = task['source']
+    roop.globals.target_path = task['target']
+    roop.globals.output_path = task['output']
+    roop.globals.keep_fps = bool(task.get('keep_fps', False))
+    for frame_processor in core.get_frame_processors_modules(roop.globals.frame_processors):
+        if not frame_processor.pre_start():
+            raise RuntimeError('frame processor pre-start failed (no face in source?)')
+    core.start()
+    recompress_jpeg(roop.globals.output_path)
+
+
+def recompress_jpeg(output_path: str) -> None:
+    """Re-encode JPEG outputs at a bounded quality so uploads move fewer bytes."""
+    if not output_path.lower().endswith(('.jpg', '.jpeg')):
+        return
+    image = cv2.imread(output_path)
+    if image is None:
+        return
+    cv2.imwrite(output_path, image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+
+
+def write_result(result: dict) -> None:
+    _protocol_out.write(json.dumps(result) + '\n')
+    _protocol_out.flush()
+
+
+def main() -> None:
+    configure_defaults()
+    if not core.pre_check():
+        sys.exit(1)
+    for frame_processor in core.get_frame_processors_modules(roop.globals.frame_processors):
+        if not frame_processor.pre_check():
+            sys.exit(1)
+    core.limit_resources()
+    write_result({'ready': True})
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            process_task(json.loads(line))
+            result = {'ok': True}
+        except SystemExit:
+            # roop calls destroy() when the content filter blocks a target
+            result = {'ok': False, 'error': 'target blocked by content filter'}
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        write_result(result)
+
+
+if __name__ == '__main__':
+    main()